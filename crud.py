@@ -1,15 +1,34 @@
 # crud.py
+from sqlalchemy import bindparam, insert, select, update
 from sqlalchemy.orm import Session
 from models import Document
+from utils import compress_text
+
+# Built once so lookups skip statement construction on every call
+GET_DOCUMENT_STMT = select(Document).where(Document.id == bindparam("doc_id"))
 
 def save_document(db: Session, filename: str, content: str) -> Document:
     """Save document metadata and content to the database."""
-    document = Document(filename=filename, content=content)
+    # Content is supplied up front, so the document is immediately answerable
+    document = Document(filename=filename, content_zstd=compress_text(content), status="ready")
     db.add(document)
     db.commit()
     db.refresh(document)
     return document
 
+def save_documents(db: Session, documents: list) -> list:
+    """Insert many documents in one statement, returning their ids and upload dates in input order."""
+    query = insert(Document).returning(Document.id, Document.upload_date)
+    rows = db.execute(query, documents).all()
+    db.commit()
+    # RETURNING order is unspecified, but SQLite hands out rowids in VALUES order
+    return sorted(rows, key=lambda row: row.id)
+
+def mark_documents_failed(db: Session, document_ids: list) -> None:
+    """Mark documents failed, e.g. when they could not be queued for parsing."""
+    db.execute(update(Document).where(Document.id.in_(document_ids)).values(status="failed"))
+    db.commit()
+
 def get_document_by_id(db: Session, document_id: int) -> Document:
     """Retrieve document by ID from the database."""
-    return db.query(Document).filter(Document.id == document_id).first()
+    return db.scalars(GET_DOCUMENT_STMT, {"doc_id": document_id}).first()
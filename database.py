@@ -1,29 +1,43 @@
 # database.py
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from models import Base
 
 # Database configuration
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"  # Use appropriate database URL
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
-# Create the database engine
+# Create the database engine (used by init_db and the background worker)
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 
-# Create the base class for declarative models
-Base = declarative_base()
+# Async engine for the API; pooled connections keep SQLite's page cache warm between requests
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=10,
+    max_overflow=5,
+    pool_pre_ping=True,
+)
+
+# Tune every new SQLite connection once: WAL lets readers run alongside the writer
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+event.listen(engine, "connect", set_sqlite_pragmas)
+event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
 
 # SessionLocal will be used to create a database session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Document model for storing PDF metadata and content
-class Document(Base):
-    __tablename__ = "documents"
-
-    id = Column(Integer, primary_key=True, index=True)
-    filename = Column(String, index=True)  # Store the file name
-    content = Column(Text)                 # Store extracted text from the PDF
-    upload_date = Column(DateTime, default=datetime.utcnow)  # Store upload timestamp
+# AsyncSessionLocal creates the sessions used by the API endpoints
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Create the database tables
 def init_db():
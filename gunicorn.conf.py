@@ -0,0 +1,11 @@
+# gunicorn.conf.py
+# Run with: gunicorn main:app -c gunicorn.conf.py
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# One worker per core; UvicornWorker picks up uvloop and httptools when they are installed
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+worker_connections = 1000
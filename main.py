@@ -1,209 +1,533 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from fastapi_limiter import FastAPILimiter
 from fastapi_limiter.depends import RateLimiter
-from sqlalchemy.orm import Session
-from database import init_db, SessionLocal, Document
+from sqlalchemy import bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from database import init_db, AsyncSessionLocal
+from crud import GET_DOCUMENT_STMT, mark_documents_failed, save_documents
+from models import Document
 from pydantic import BaseModel
-from PyPDF2 import PdfReader, errors as pdf_errors
+from tasks import parse_pdf
+from utils import (
+    split_into_chunks,
+    build_retrieval_index,
+    find_relevant_chunk,
+    retrieval_index_key,
+    decompress_text,
+    find_verbatim_answer,
+)
 import os
-import json
-import requests
+import orjson
+import xxhash
+import msgpack
+import pickle
+import tempfile
+import threading
+import httpx
+import numpy as np
 from dotenv import load_dotenv
 from typing import List
-import difflib  # for simple chunk relevance matching
+from datetime import datetime
 from redis.asyncio import Redis
+from cachetools import TTLCache
 from time import time
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Initialize the database
 init_db()
 
+# Uploaded PDFs wait here until the worker has parsed them
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+MAX_BULK_UPLOAD_FILES = 10
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Room for multipart boundaries and part headers on top of each file
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Statements for the hot read paths, built once at import instead of on every request.
+# Metadata lookups never load the (potentially large) extracted text.
+GET_DOCUMENT_METADATA_STMT = GET_DOCUMENT_STMT.options(
+    load_only(Document.id, Document.filename, Document.upload_date, Document.status)
+)
+GET_DOCUMENT_STATUS_STMT = GET_DOCUMENT_STMT.options(load_only(Document.id, Document.status))
+GET_DOCUMENT_EXISTS_STMT = select(Document.id).where(Document.id == bindparam("doc_id"))
+GET_DOCUMENT_CONTENT_STMT = select(Document.status, Document.content_zstd).where(Document.id == bindparam("doc_id"))
+# Only selects columns in ix_documents_upload_date, so SQLite never touches the table rows
+LIST_DOCUMENTS_STMT = (
+    select(Document.id, Document.filename, Document.upload_date)
+    .order_by(Document.upload_date.desc())
+    .limit(bindparam("limit"))
+    .offset(bindparam("offset"))
+)
+
+# Reject oversized uploads from Content-Length before the form is parsed and spooled.
+# Chunked requests carry no length, so spool_pdf_upload still enforces the limit per file.
+UPLOAD_FILE_COUNTS = {"/documents/upload": 1, "/documents/bulk-upload": MAX_BULK_UPLOAD_FILES}
+
+# Plain ASGI rather than @app.middleware, so every other request passes straight through
+class UploadSizeLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        files = UPLOAD_FILE_COUNTS.get(scope["path"]) if scope["type"] == "http" else None
+        if files:
+            content_length = dict(scope["headers"]).get(b"content-length", b"")
+            if content_length.isdigit() and int(content_length) > files * (MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD):
+                response = ORJSONResponse(status_code=413, content={"detail": "Request exceeds the upload size limit"})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # Dependency to get the database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+# Same Redis as the worker, which writes the retrieval indexes this app reads and invalidates
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
 # Initialize rate limiting middleware
 @app.on_event("startup")
 async def startup():
-    redis_client = Redis(host="localhost", port=6379, db=0, decode_responses=True)
+    redis_client = Redis.from_url(REDIS_URL, decode_responses=True)
     await FastAPILimiter.init(redis_client)
+    app.state.redis = redis_client
+    # Pickled retrieval indexes and msgpack answers are binary, so they need a client that doesn't decode replies
+    app.state.binary_redis = Redis.from_url(REDIS_URL)
+    # Shared client so Hugging Face calls reuse pooled keep-alive connections
+    app.state.http = httpx.AsyncClient(
+        http2=True, timeout=30, limits=httpx.Limits(max_keepalive_connections=32)
+    )
+
+@app.on_event("shutdown")
+async def shutdown():
+    await app.state.http.aclose()
+    await app.state.binary_redis.aclose()
 
 # Pydantic models for responses
 class DocumentResponse(BaseModel):
     id: int
     filename: str
-    upload_date: str
+    upload_date: datetime
+    status: str
 
 class DocumentListResponse(BaseModel):
     id: int
     filename: str
-    upload_date: str
+    upload_date: datetime
+
+class DocumentStatusResponse(BaseModel):
+    id: int
+    status: str
 
 class QuestionRequest(BaseModel):
     document_id: int
     question: str
 
-# Endpoint to upload a PDF file
-@app.post("/documents/upload", response_model=DocumentResponse)
-async def upload_document(file: UploadFile = File(...), db: Session = Depends(get_db)):
+# Helpers shared by the upload endpoints
+def spool_pdf_upload(file: UploadFile) -> str:
+    # Copy the upload to disk chunk by chunk so a large PDF is never held in memory
+    spool = tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, suffix=".pdf", delete=False)
+    try:
+        with spool:
+            chunk = file.file.read(UPLOAD_CHUNK_SIZE)
+            if b"%PDF-" not in chunk[:1024]:
+                raise HTTPException(status_code=400, detail=f"Error reading PDF file {file.filename}: not a PDF document")
+            size = 0
+            while chunk:
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise HTTPException(status_code=413, detail=f"File {file.filename} exceeds the {MAX_UPLOAD_SIZE // (1024 * 1024)} MB upload limit")
+                spool.write(chunk)
+                chunk = file.file.read(UPLOAD_CHUNK_SIZE)
+    except Exception:
+        os.remove(spool.name)
+        raise
+    return spool.name
+
+async def enqueue_parsing(document_id: int, spool_path: str):
+    # Ids aren't reused (AUTOINCREMENT), but clear anything stale left under this id just in case
+    await app.state.binary_redis.delete(retrieval_index_key(document_id))
+    document_content_cache.pop(document_id, None)
+
+    path = os.path.join(UPLOAD_DIR, f"{document_id}.pdf")
+    os.replace(spool_path, path)
     try:
-        pdf_reader = PdfReader(file.file)
-        text_content = ""
-        for page in pdf_reader.pages:
-            text_content += page.extract_text() + "\n"
+        # Publishing to the broker blocks (and retries the connection), so keep it off the event loop
+        await run_in_threadpool(parse_pdf.delay, document_id, path)
+    except Exception:
+        os.remove(path)
+        raise
+
+def discard_spooled_uploads(paths):
+    # Spooled files are moved once enqueued, so anything left behind belongs to a failed upload
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+# Endpoint to upload a PDF file; parsing happens in the background worker
+@app.post("/documents/upload", response_model=DocumentResponse, status_code=202)
+async def upload_document(file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
+    spool_path = await run_in_threadpool(spool_pdf_upload, file)
 
-        new_document = Document(filename=file.filename, content=text_content)
+    try:
+        new_document = Document(filename=file.filename, status="pending")
         db.add(new_document)
-        db.commit()
-        db.refresh(new_document)
+        await db.commit()
+        await db.refresh(new_document)
+        try:
+            await enqueue_parsing(new_document.id, spool_path)
+        except Exception:
+            # Otherwise the row would report pending forever
+            await db.run_sync(mark_documents_failed, [new_document.id])
+            raise
 
         return DocumentResponse(
             id=new_document.id,
             filename=new_document.filename,
-            upload_date=new_document.upload_date.isoformat()
+            upload_date=new_document.upload_date,
+            status=new_document.status
         )
-    except pdf_errors.DependencyError:
-        raise HTTPException(status_code=500, detail="PyCryptodome library is required for AES-encrypted PDFs.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+    finally:
+        discard_spooled_uploads([spool_path])
+
+# Endpoint to upload several PDF files with a single INSERT ... RETURNING
+@app.post("/documents/bulk-upload", response_model=List[DocumentResponse], status_code=202)
+async def bulk_upload_documents(files: List[UploadFile] = File(...), db: AsyncSession = Depends(get_db)):
+    if len(files) > MAX_BULK_UPLOAD_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_UPLOAD_FILES} files can be uploaded at once")
+
+    uploads = []
+    try:
+        for file in files:
+            uploads.append((file.filename, await run_in_threadpool(spool_pdf_upload, file)))
+
+        rows = await db.run_sync(
+            save_documents, [{"filename": filename, "status": "pending"} for filename, _ in uploads]
+        )
+
+        for position, (row, (_, spool_path)) in enumerate(zip(rows, uploads)):
+            try:
+                await enqueue_parsing(row.id, spool_path)
+            except Exception:
+                # Documents already queued will still be parsed; the rest would report pending forever
+                await db.run_sync(mark_documents_failed, [pending.id for pending in rows[position:]])
+                raise
+
+        return [
+            DocumentResponse(
+                id=row.id,
+                filename=filename,
+                upload_date=row.upload_date,
+                status="pending"
+            ) for row, (filename, _) in zip(rows, uploads)
+        ]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing files: {str(e)}")
+    finally:
+        discard_spooled_uploads([spool_path for _, spool_path in uploads])
 
 # Endpoint to retrieve a document by ID
 @app.get("/documents/{document_id}", response_model=DocumentResponse)
-def get_document(document_id: int, db: Session = Depends(get_db)):
-    document = db.query(Document).filter(Document.id == document_id).first()
+async def get_document(document_id: int, db: AsyncSession = Depends(get_db)):
+    document = (await db.scalars(GET_DOCUMENT_METADATA_STMT, {"doc_id": document_id})).first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     return DocumentResponse(
         id=document.id,
         filename=document.filename,
-        upload_date=document.upload_date.isoformat()
+        upload_date=document.upload_date,
+        status=document.status
     )
 
-# Endpoint to list all documents
+# Endpoint to poll the parsing status of an uploaded document
+@app.get("/documents/{document_id}/status", response_model=DocumentStatusResponse)
+async def get_document_status(document_id: int, db: AsyncSession = Depends(get_db)):
+    document = (await db.scalars(GET_DOCUMENT_STATUS_STMT, {"doc_id": document_id})).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return DocumentStatusResponse(id=document.id, status=document.status)
+
+# Endpoint to list documents, newest first
 @app.get("/documents", response_model=List[DocumentListResponse])
-def list_documents(db: Session = Depends(get_db)):
-    documents = db.query(Document).all()
+async def list_documents(
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    documents = (await db.execute(LIST_DOCUMENTS_STMT, {"limit": limit, "offset": offset})).all()
     return [
         DocumentListResponse(
             id=document.id,
             filename=document.filename,
-            upload_date=document.upload_date.isoformat()
+            upload_date=document.upload_date
         ) for document in documents
     ]
 
 # Endpoint to delete a document
 @app.delete("/documents/{document_id}")
-def delete_document(document_id: int, db: Session = Depends(get_db)):
-    document = db.query(Document).filter(Document.id == document_id).first()
+async def delete_document(document_id: int, db: AsyncSession = Depends(get_db)):
+    document = (await db.scalars(GET_DOCUMENT_METADATA_STMT, {"doc_id": document_id})).first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
-    db.delete(document)
-    db.commit()
+    await db.delete(document)
+    await db.commit()
+    await app.state.binary_redis.delete(retrieval_index_key(document_id))
+    await invalidate_answer_cache(document_id)
+    document_content_cache.pop(document_id, None)
     return {"message": "Document deleted successfully"}
 
+# Content of recently queried documents, so follow-up questions skip reading the text column
+document_content_cache = TTLCache(maxsize=128, ttl=300)
+
+# Returns (status, content) for a document, or None if it doesn't exist
+async def load_document_content(db: AsyncSession, document_id: int):
+    content = document_content_cache.get(document_id)
+    if content is not None:
+        # Another worker may have deleted the document; a primary key lookup catches that cheaply
+        if await db.scalar(GET_DOCUMENT_EXISTS_STMT, {"doc_id": document_id}) is not None:
+            return "ready", content
+        document_content_cache.pop(document_id, None)
+        return None
+    document = (await db.execute(GET_DOCUMENT_CONTENT_STMT, {"doc_id": document_id})).first()
+    if document is None:
+        return None
+    if document.status != "ready":
+        return document.status, None
+    # Cached decompressed, so only cold loads pay for decompression
+    content = decompress_text(document.content_zstd)
+    document_content_cache[document_id] = content
+    return document.status, content
+
 # Endpoint for question answering with rate limiting
 @app.post("/question-answer", dependencies=[Depends(RateLimiter(times=5, seconds=60))])
-async def question_answer(request: QuestionRequest, db: Session = Depends(get_db)):
-    document = db.query(Document).filter(Document.id == request.document_id).first()
+async def question_answer(request: QuestionRequest, db: AsyncSession = Depends(get_db)):
+    document = await load_document_content(db, request.document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
-    answer = get_answer(request.question, document.content)
+    status, content = document
+    if status != "ready":
+        raise HTTPException(status_code=409, detail=f"Document is not ready (status: {status})")
+    answer = await get_answer(request.question, request.document_id, content)
     return {"answer": answer}
 
-# WebSocket for real-time question answering with rate limiting
-websocket_rate_limiter = {}
+# WebSocket messages get the same limit as the REST endpoint (a separate budget), counted in Redis so it holds across workers
+WEBSOCKET_RATE_LIMIT = 5
+WEBSOCKET_RATE_WINDOW = 60
 
+async def allow_websocket_request(client_id: str) -> bool:
+    key = f"wsrl:{client_id}"
+    pipeline = app.state.redis.pipeline()
+    pipeline.incr(key)
+    pipeline.expire(key, WEBSOCKET_RATE_WINDOW, nx=True)
+    count, _ = await pipeline.execute()
+    return count <= WEBSOCKET_RATE_LIMIT
+
+# WebSocket for real-time question answering with rate limiting
 @app.websocket("/ws/question")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+    document_id = None
     document_content = None
-    db: Session = next(get_db())
-    
+
     try:
         while True:
             data = await websocket.receive_text()
-            question_data = json.loads(data)
+            question_data = orjson.loads(data)
 
             # Apply rate limiting
-            client_id = websocket.client.host
-            current_time = time()
-            last_request_time = websocket_rate_limiter.get(client_id, 0)
-
-            if current_time - last_request_time < 60:
+            if not await allow_websocket_request(websocket.client.host):
                 await websocket.send_text("Rate limit exceeded. Please wait a moment.")
                 continue
 
-            websocket_rate_limiter[client_id] = current_time  # Update last request time
-            
             if "document_id" in question_data:
-                document_id = question_data["document_id"]
-                document = db.query(Document).filter(Document.id == document_id).first()
-                if document:
-                    document_content = document.content
-                else:
+                async with AsyncSessionLocal() as db:
+                    document = await load_document_content(db, question_data["document_id"])
+                if not document:
                     await websocket.send_text("Document not found.")
                     continue
+                status, content = document
+                if status != "ready":
+                    await websocket.send_text(f"Document is not ready (status: {status}).")
+                    continue
+                document_id = question_data["document_id"]
+                document_content = content
 
             question = question_data.get("question")
             if not document_content:
                 await websocket.send_text("No document content available for context.")
                 continue
 
-            answer = get_answer(question, document_content)
+            answer = await get_answer(question, document_id, document_content)
             await websocket.send_text(answer)
     except WebSocketDisconnect:
         print("Client disconnected")
-    finally:
-        db.close()
+
+# Count all questions and fast path hits; qa.fast_path_hit_ratio is their ratio
+QA_METRICS_KEY = "qa:metrics"
 
 # Helper to fetch answers using Hugging Face Inference API
-def get_answer(question: str, context: str):
+async def get_answer(question: str, document_id: int, context: str):
     try:
-        context_chunks = split_into_chunks(context)
-        relevant_chunk = find_relevant_chunk(question, context_chunks)
+        exact_key = exact_cache_key(question, document_id)
+        # The question counter rides along with the exact lookup rather than costing its own round trip
+        pipeline = app.state.binary_redis.pipeline()
+        pipeline.get(exact_key)
+        pipeline.hincrby(QA_METRICS_KEY, "questions", 1)
+        cached_entry, _ = await pipeline.execute()
+        if cached_entry is not None:
+            return msgpack.unpackb(cached_entry)["a"]
+
+        # A keyword that appears exactly once in the document answers the question without the model
+        fast_answer = await run_in_threadpool(find_verbatim_answer, question, context)
+        if fast_answer is not None:
+            await app.state.binary_redis.hincrby(QA_METRICS_KEY, "fast_path_hits", 1)
+            return fast_answer.replace("\n", " ")
+
+        question_embedding = await run_in_threadpool(embed_question, question)
+        cached_answer = await find_similar_answer(document_id, question_embedding)
+        if cached_answer is not None:
+            return cached_answer
+
+        vectorizer, matrix, context_chunks = await get_retrieval_index(document_id, context)
+        relevant_chunk = find_relevant_chunk(question, vectorizer, matrix, context_chunks)
 
         model_name = "distilbert-base-uncased-distilled-squad"
         url = f"https://api-inference.huggingface.co/models/{model_name}"
-        headers = {"Authorization": f"Bearer {os.getenv('HUGGINGFACEHUB_TOKEN')}"}
-        data = {"inputs": {"question": question, "context": relevant_chunk}}
-        response = requests.post(url, headers=headers, json=data)
+        # Let the Inference API serve repeated (question, chunk) inputs from its own cache
+        headers = {
+            "Authorization": f"Bearer {os.getenv('HUGGINGFACEHUB_TOKEN')}",
+            "X-Use-Cache": "true",
+        }
+        data = {
+            "inputs": {"question": question, "context": relevant_chunk},
+            "options": {"use_cache": True, "wait_for_model": True},
+        }
+        response = await app.state.http.post(url, headers=headers, json=data)
 
         if response.status_code == 200:
-            answer = response.json().get("answer", "No answer found.")
-            return answer.replace("\n", " ")
+            answer = orjson.loads(response.content).get("answer", "No answer found.").replace("\n", " ")
+            await cache_answer(document_id, exact_key, question_embedding, answer)
+            return answer
         else:
             return f"Error: {response.status_code}, {response.text}"
     except Exception as e:
         return f"An error occurred: {str(e)}"
 
-# Helper functions for context processing
-def split_into_chunks(text, chunk_size=1000):
-    # Split text while preserving word boundaries
-    words = text.split(" ")
-    chunks = []
-    current_chunk = []
-
-    for word in words:
-        if sum(len(w) for w in current_chunk) + len(word) > chunk_size:
-            chunks.append(" ".join(current_chunk))
-            current_chunk = [word]
+# Indexes rebuilt here expire, so one rebuilt just after a delete doesn't linger forever
+RETRIEVAL_INDEX_TTL = 3600
+
+# Load the retrieval index built by the worker, building it here if it's missing
+async def get_retrieval_index(document_id: int, context: str):
+    key = retrieval_index_key(document_id)
+    payload = await app.state.binary_redis.get(key)
+    if payload is not None:
+        return pickle.loads(payload)
+    index = await run_in_threadpool(build_retrieval_index, split_into_chunks(context))
+    await app.state.binary_redis.set(key, pickle.dumps(index), ex=RETRIEVAL_INDEX_TTL)
+    return index
+
+# Answer cache: exact (document, question) matches first, then semantically similar questions
+ANSWER_CACHE_TTL = 3600
+SEMANTIC_CACHE_THRESHOLD = 0.92
+# Questions kept per document for the semantic lookup; the oldest are evicted beyond this
+SEMANTIC_CACHE_MAX_ENTRIES = 256
+embedding_model = None
+# Questions are embedded in the threadpool, so concurrent first questions must not each load the model
+embedding_model_lock = threading.Lock()
+
+def embed_question(question):
+    global embedding_model
+    if embedding_model is None:
+        with embedding_model_lock:
+            if embedding_model is None:
+                # Deferred so the model is only loaded once the first question comes in
+                from sentence_transformers import SentenceTransformer
+                embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+    return embedding_model.encode(question, normalize_embeddings=True).astype(np.float32)
+
+def exact_cache_key(question, document_id):
+    # A cache namespace doesn't need a cryptographic hash; XXH3 is far cheaper on long questions
+    digest = xxhash.xxh3_128_hexdigest(f"{document_id}\x00{question}".encode())
+    return f"qa:exact:{document_id}:{digest}"
+
+def semantic_cache_key(document_id):
+    return f"qa:sem:{document_id}"
+
+async def find_similar_answer(document_id, question_embedding):
+    key = semantic_cache_key(document_id)
+    fields = await app.state.binary_redis.hgetall(key)
+    # The hash's own EXPIRE is refreshed on every write, so each entry is aged by its timestamp
+    cutoff = time() - ANSWER_CACHE_TTL
+    entries, expired = [], []
+    for field, entry in fields.items():
+        entry = msgpack.unpackb(entry)
+        if entry["ts"] >= cutoff:
+            entries.append(entry)
         else:
-            current_chunk.append(word)
+            expired.append(field)
+    if expired:
+        await app.state.binary_redis.hdel(key, *expired)
+    if not entries:
+        return None
+    embeddings = np.stack([np.frombuffer(entry["e"], dtype=np.float32) for entry in entries])
+    # Embeddings are normalised, so the dot product is the cosine similarity
+    scores = embeddings @ question_embedding
+    best = int(scores.argmax())
+    if scores[best] >= SEMANTIC_CACHE_THRESHOLD:
+        return entries[best]["a"]
+    return None
 
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
+async def cache_answer(document_id, exact_key, question_embedding, answer):
+    key = semantic_cache_key(document_id)
+    now = time()
+    pipeline = app.state.binary_redis.pipeline()
+    pipeline.set(exact_key, msgpack.packb({"a": answer, "ts": now}), ex=ANSWER_CACHE_TTL)
+    pipeline.hset(key, exact_key, msgpack.packb({"a": answer, "e": question_embedding.tobytes(), "ts": now}))
+    pipeline.expire(key, ANSWER_CACHE_TTL)
+    pipeline.hlen(key)
+    *_, size = await pipeline.execute()
+    if size > SEMANTIC_CACHE_MAX_ENTRIES:
+        await evict_oldest_answers(key, size - SEMANTIC_CACHE_MAX_ENTRIES)
 
-    return chunks
+async def evict_oldest_answers(key, count):
+    fields = await app.state.binary_redis.hgetall(key)
+    oldest = sorted(fields, key=lambda field: msgpack.unpackb(fields[field])["ts"])[:count]
+    if oldest:
+        await app.state.binary_redis.hdel(key, *oldest)
 
-def find_relevant_chunk(question, chunks):
-    scores = [(chunk, difflib.SequenceMatcher(None, question, chunk).ratio()) for chunk in chunks]
-    scores.sort(key=lambda x: x[1], reverse=True)
-    return scores[0][0] if scores else ""
+async def invalidate_answer_cache(document_id):
+    # The semantic hash is keyed by exact keys, so it lists them without scanning the keyspace.
+    # Exact entries already evicted from the hash are left to expire with their TTL.
+    redis = app.state.binary_redis
+    key = semantic_cache_key(document_id)
+    exact_keys = await redis.hkeys(key)
+    await redis.delete(key, *exact_keys)
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # Rate limits, caches and retrieval indexes live in Redis, so workers can be scaled freely
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count())),
+        loop="uvloop",
+        http="httptools",
+    )
@@ -1,10 +1,12 @@
 import pytest
 from fastapi.testclient import TestClient
 from main import app
-from unittest.mock import patch
+from utils import question_keywords, find_verbatim_answer, split_into_chunks, build_retrieval_index, find_relevant_chunk, compress_text, decompress_text
+from unittest.mock import patch, AsyncMock
 from io import BytesIO
 from fastapi import WebSocketDisconnect
 import json
+import os
 
 # Initialize TestClient
 client = TestClient(app)
@@ -23,19 +25,22 @@ def mock_redis():
 
 # 1. Test for PDF upload functionality
 def test_upload_pdf(mock_db_session):
-    """Test uploading a valid PDF file."""
-    pdf_file = BytesIO(b"PDF content")
+    """Test uploading a valid PDF file; parsing is queued for the worker."""
+    pdf_file = BytesIO(b"%PDF-1.4 PDF content")
     pdf_file.name = "test.pdf"
     
-    response = client.post(
-        "/documents/upload", 
-        files={"file": ("test.pdf", pdf_file, "application/pdf")}
-    )
+    with patch("main.enqueue_parsing", new_callable=AsyncMock) as enqueue:
+        response = client.post(
+            "/documents/upload", 
+            files={"file": ("test.pdf", pdf_file, "application/pdf")}
+        )
     
-    assert response.status_code == 200
+    assert response.status_code == 202
     data = response.json()
     assert "id" in data
     assert data["filename"] == "test.pdf"
+    assert data["status"] == "pending"
+    enqueue.assert_awaited_once()
 
 # 2. Test for unsupported file type (non-PDF)
 def test_upload_unsupported_file(mock_db_session):
@@ -154,3 +159,191 @@ def test_empty_question():
     response = client.post("/question-answer", json=question_data)
     assert response.status_code == 400  # Bad Request
     assert "Question cannot be empty" in response.json().get("detail", "")
+
+# 13. Test for oversized uploads rejected from Content-Length
+def test_upload_content_length_too_large(mock_db_session):
+    """Test that a declared body over the upload limit is rejected before parsing."""
+    pdf_file = BytesIO(b"%PDF-1.4 " + b"0" * 2048)
+    
+    with patch("main.MAX_UPLOAD_SIZE", 1024), patch("main.MULTIPART_OVERHEAD", 0):
+        response = client.post(
+            "/documents/upload", 
+            files={"file": ("large.pdf", pdf_file, "application/pdf")}
+        )
+    
+    assert response.status_code == 413
+    assert "upload size limit" in response.json().get("detail", "")
+
+# 14. Test for too many files in one bulk upload
+def test_bulk_upload_too_many_files(mock_db_session):
+    """Test that bulk upload rejects more files than the per-request cap."""
+    files = [
+        ("files", (f"test{i}.pdf", BytesIO(b"%PDF-1.4 PDF content"), "application/pdf"))
+        for i in range(3)
+    ]
+    
+    with patch("main.MAX_BULK_UPLOAD_FILES", 2), patch("main.enqueue_parsing", new_callable=AsyncMock) as enqueue:
+        response = client.post("/documents/bulk-upload", files=files)
+    
+    assert response.status_code == 400
+    assert "At most 2 files" in response.json().get("detail", "")
+    enqueue.assert_not_awaited()
+
+# 15. Test for bulk upload keeping ids in file order
+def test_bulk_upload_order(mock_db_session):
+    """Test that bulk upload returns one pending document per file, ids ascending in file order."""
+    filenames = ["first.pdf", "second.pdf", "third.pdf"]
+    files = [
+        ("files", (filename, BytesIO(b"%PDF-1.4 PDF content"), "application/pdf"))
+        for filename in filenames
+    ]
+    
+    with patch("main.enqueue_parsing", new_callable=AsyncMock) as enqueue:
+        response = client.post("/documents/bulk-upload", files=files)
+    
+    assert response.status_code == 202
+    data = response.json()
+    assert [document["filename"] for document in data] == filenames
+    assert all(document["status"] == "pending" for document in data)
+    ids = [document["id"] for document in data]
+    assert ids == sorted(ids)
+    assert [call.args[0] for call in enqueue.await_args_list] == ids
+
+# 16. Test for non-PDF files in a bulk upload
+def test_bulk_upload_unsupported_file(mock_db_session):
+    """Test that bulk upload rejects the request if any file is not a PDF."""
+    files = [
+        ("files", ("test.pdf", BytesIO(b"%PDF-1.4 PDF content"), "application/pdf")),
+        ("files", ("test.txt", BytesIO(b"Some text content"), "text/plain")),
+    ]
+    
+    with patch("main.enqueue_parsing", new_callable=AsyncMock) as enqueue:
+        response = client.post("/documents/bulk-upload", files=files)
+    
+    assert response.status_code == 400
+    assert "test.txt" in response.json().get("detail", "")
+    enqueue.assert_not_awaited()
+
+# 17. Test for oversized files caught while spooling
+def test_upload_file_too_large(mock_db_session):
+    """Test that a file over the limit is rejected while copied, even if Content-Length passes."""
+    pdf_file = BytesIO(b"%PDF-1.4 " + b"0" * 2048)
+    
+    with patch("main.MAX_UPLOAD_SIZE", 1024), patch("main.MULTIPART_OVERHEAD", 4096):
+        response = client.post(
+            "/documents/upload", 
+            files={"file": ("large.pdf", pdf_file, "application/pdf")}
+        )
+    
+    assert response.status_code == 413
+    assert "large.pdf" in response.json().get("detail", "")
+
+# 18. Test for document parsing status
+def test_document_status(mock_db_session):
+    """Test polling the parsing status of an uploaded document."""
+    with patch("main.enqueue_parsing", new_callable=AsyncMock):
+        document = client.post(
+            "/documents/upload", 
+            files={"file": ("test.pdf", BytesIO(b"%PDF-1.4 PDF content"), "application/pdf")}
+        ).json()
+    
+    response = client.get(f"/documents/{document['id']}/status")
+    assert response.status_code == 200
+    assert response.json() == {"id": document["id"], "status": "pending"}
+    
+    response = client.get("/documents/9999/status")
+    assert response.status_code == 404
+
+# 19. Test for listing documents with limit and offset
+def test_list_documents_pagination(mock_db_session):
+    """Test that limit and offset page through documents, newest first."""
+    with patch("main.enqueue_parsing", new_callable=AsyncMock):
+        client.post(
+            "/documents/bulk-upload", 
+            files=[("files", (f"page{i}.pdf", BytesIO(b"%PDF-1.4 PDF content"), "application/pdf")) for i in range(3)]
+        )
+    
+    first_page = client.get("/documents", params={"limit": 2}).json()
+    second_page = client.get("/documents", params={"limit": 2, "offset": 1}).json()
+    assert len(first_page) == 2
+    assert second_page[0] == first_page[1]
+    assert first_page[0]["upload_date"] >= first_page[1]["upload_date"]
+    
+    assert client.get("/documents", params={"limit": 0}).status_code == 422
+    assert client.get("/documents", params={"offset": -1}).status_code == 422
+
+# 20. Test for uploads whose parsing job can't be queued
+def test_upload_enqueue_failure(mock_db_session):
+    """Test that a document whose parsing job can't be queued is marked failed and its file removed."""
+    pdf_file = BytesIO(b"%PDF-1.4 PDF content")
+    
+    with patch.object(app.state, "binary_redis", AsyncMock(), create=True), \
+            patch("main.parse_pdf.delay", side_effect=ConnectionError("broker unavailable")) as delay:
+        response = client.post(
+            "/documents/upload", 
+            files={"file": ("test.pdf", pdf_file, "application/pdf")}
+        )
+    
+    assert response.status_code == 500
+    assert "broker unavailable" in response.json().get("detail", "")
+    document_id, document_path = delay.call_args.args
+    assert not os.path.exists(document_path)
+    assert client.get(f"/documents/{document_id}/status").json()["status"] == "failed"
+
+# 21. Test for splitting document text into chunks
+def test_split_into_chunks():
+    """Test that chunks cover the text exactly and stay within chunk_size plus the separating whitespace."""
+    text = "The quick brown fox jumps over the lazy dog.\n" * 20
+    chunks = split_into_chunks(text, chunk_size=50)
+    
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 51 for chunk in chunks)
+    assert len(chunks) > 1
+
+# 22. Test for chunking text without whitespace
+def test_split_into_chunks_hard_cut():
+    """Test that a run with no whitespace is cut at chunk_size."""
+    chunks = split_into_chunks("x" * 25, chunk_size=10)
+    
+    assert chunks == ["x" * 10, "x" * 10, "x" * 5]
+    assert split_into_chunks("", chunk_size=10) == []
+
+# 23. Test for retrieving the chunk most relevant to a question
+def test_find_relevant_chunk():
+    """Test that TF-IDF retrieval picks the chunk sharing the question's terms."""
+    chunks = [
+        "The invoice lists the shipping costs for March.",
+        "Photosynthesis converts sunlight into chemical energy in plants.",
+        "The meeting was moved to the second floor conference room.",
+    ]
+    
+    index = build_retrieval_index(chunks)
+    assert find_relevant_chunk("How do plants use sunlight?", *index) == chunks[1]
+    assert find_relevant_chunk("Anything?", *build_retrieval_index([])) == ""
+
+# 24. Test for compressed document content
+def test_compress_text_round_trip():
+    """Test that compressed document text decompresses to the original."""
+    text = "Unicode text \u00e9\u4e2d\u6587 with repetition. " * 100
+    compressed = compress_text(text)
+    
+    assert len(compressed) < len(text.encode())
+    assert decompress_text(compressed) == text
+
+# 25. Test for picking keywords out of a question
+def test_question_keywords():
+    """Test that only proper nouns and numbers are keywords, not words capitalised to start a sentence."""
+    assert question_keywords("Tell me about the results") == []
+    assert question_keywords("Explain section 3") == ["3"]
+    assert question_keywords("What did Apple's CEO say?") == ["apple"]
+    assert question_keywords("Who founded Acme? When was Berlin chosen.") == ["acme", "berlin"]
+
+# 26. Test for answering from a unique keyword match
+def test_find_verbatim_answer():
+    """Test that a keyword found exactly once answers from the surrounding text, with offsets into the original."""
+    context = "\u0130stanbul notes. The results were good. Marconi led the project. The results were final."
+    
+    answer = find_verbatim_answer("Who was Marconi?", context, before=6, after=23)
+    assert answer == "good. Marconi led the project"
+    assert find_verbatim_answer("Tell me about the results", context) is None
+    assert find_verbatim_answer("Where is Paris?", context) is None
@@ -1,14 +1,23 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Text, DateTime
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import desc, Column, Index, Integer, LargeBinary, String, DateTime
+from sqlalchemy.orm import declarative_base
 from datetime import datetime
 
+# Create the base class for declarative models
 Base = declarative_base()
 
+# Document model for storing PDF metadata and content
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        # Newest-first listing; with filename included (and id as the rowid) the index covers it
+        Index("ix_documents_upload_date", desc("upload_date"), "filename"),
+        # Never reuse the id of a deleted document, whose indexes and cached answers may linger in Redis
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    filename = Column(String, index=True)
-    upload_date = Column(DateTime, default=datetime.utcnow)
-    content = Column(Text)  # Store extracted text content from the PDF
+    filename = Column(String(255), index=True)  # Store the file name
+    content_zstd = Column(LargeBinary)          # Store extracted text from the PDF, zstd-compressed
+    upload_date = Column(DateTime, default=datetime.utcnow)  # Store upload timestamp
+    status = Column(String(16), default="pending")  # Parsing status: pending, ready or failed
@@ -0,0 +1,71 @@
+# tasks.py
+import os
+import pickle
+from multiprocessing import Pool
+from celery import Celery
+from redis import Redis
+from dotenv import load_dotenv
+from database import SessionLocal
+from models import Document
+from utils import (
+    PAGE_BATCH_SIZE,
+    get_pdf_page_count,
+    extract_text_with_pdfium,
+    split_into_chunks,
+    build_retrieval_index,
+    retrieval_index_key,
+    compress_text,
+)
+
+# Load environment variables
+load_dotenv()
+
+celery_app = Celery("tasks", broker=os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/1"))
+
+# PDF parsing is CPU heavy: take one job at a time and acknowledge it only once done.
+# Run the worker with the solo pool so large PDFs can fan out over a process pool:
+#   celery -A tasks worker -P solo --loglevel=info
+celery_app.conf.worker_prefetch_multiplier = 1
+celery_app.conf.task_acks_late = True
+
+# Retrieval indexes are shared with the API through Redis
+index_store = Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+
+def extract_pdf_text(path: str) -> str:
+    """Extract text from a PDF, splitting large files into page batches across processes."""
+    page_count = get_pdf_page_count(path)
+    if page_count <= PAGE_BATCH_SIZE:
+        return extract_text_with_pdfium(path)
+
+    batches = [
+        (path, start, min(start + PAGE_BATCH_SIZE, page_count))
+        for start in range(0, page_count, PAGE_BATCH_SIZE)
+    ]
+    with Pool() as pool:
+        return "\n".join(pool.starmap(extract_text_with_pdfium, batches))
+
+@celery_app.task
+def parse_pdf(document_id: int, path: str):
+    """Parse an uploaded PDF and store its text on the document."""
+    db = SessionLocal()
+    try:
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if not document:
+            return
+        try:
+            content = extract_pdf_text(path)
+        except Exception:
+            document.status = "failed"
+            db.commit()
+            return
+        document.content_zstd = compress_text(content)
+        document.status = "ready"
+        db.commit()
+
+        # Index once here so questions only pay for a transform and a sparse matmul
+        index = build_retrieval_index(split_into_chunks(content))
+        index_store.set(retrieval_index_key(document_id), pickle.dumps(index))
+    finally:
+        db.close()
+        if os.path.exists(path):
+            os.remove(path)
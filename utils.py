@@ -1,11 +1,103 @@
 # utils.py
-import fitz  # PyMuPDF
+import re
+import string
+from functools import lru_cache
+import pypdfium2 as pdfium
+import zstandard as zstd
+from sklearn.feature_extraction.text import TfidfVectorizer
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract text from a PDF file."""
-    text = ""
-    with fitz.open(pdf_path) as pdf:
-        for page_num in range(pdf.page_count):
+# Number of pages handed to each worker process when parsing large PDFs
+PAGE_BATCH_SIZE = 300
+# Compression level for stored document text; English text shrinks roughly 3-5x
+CONTENT_ZSTD_LEVEL = 6
+
+def get_pdf_page_count(pdf_path: str) -> int:
+    """Return the number of pages in a PDF file."""
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+def extract_text_with_pdfium(pdf_path: str, start: int = 0, stop: int = None) -> str:
+    """Extract text from pages [start, stop) of a PDF file using PDFium."""
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        pages = []
+        for page_num in range(start, len(pdf) if stop is None else stop):
             page = pdf[page_num]
-            text += page.get_text()
-    return text
+            textpage = page.get_textpage()
+            pages.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+        return "\n".join(pages)
+    finally:
+        pdf.close()
+
+@lru_cache(maxsize=None)
+def chunk_pattern(chunk_size: int) -> re.Pattern:
+    """Regex matching up to chunk_size characters plus the whitespace that ends them, or a hard cut if a run has none."""
+    return re.compile(r".{1,%d}(?:\s|$)|.{%d}" % (chunk_size, chunk_size), re.DOTALL)
+
+def compress_text(text: str) -> bytes:
+    """Compress document text for storage."""
+    # zstd contexts aren't thread safe, so each call gets its own
+    return zstd.ZstdCompressor(level=CONTENT_ZSTD_LEVEL).compress(text.encode())
+
+def decompress_text(data: bytes) -> str:
+    """Decompress document text stored with compress_text."""
+    return zstd.ZstdDecompressor().decompress(data).decode()
+
+def split_into_chunks(text: str, chunk_size: int = 1000) -> list:
+    """Split text at word boundaries into chunks of up to chunk_size characters plus one trailing whitespace character."""
+    return chunk_pattern(chunk_size).findall(text)
+
+# Proper nouns and numbers in a question are good anchors for a verbatim lookup
+QUESTION_KEYWORD_PATTERN = re.compile(r"([A-Z][a-z]+|\d+)(?:'s)?")
+
+def question_keywords(question: str) -> list:
+    """Return the proper nouns and numbers in a question, skipping words capitalised only to start a sentence."""
+    keywords = []
+    sentence_start = True
+    for token in question.split():
+        match = QUESTION_KEYWORD_PATTERN.fullmatch(token.strip(string.punctuation))
+        if match and not (sentence_start and not match.group(1).isdigit()):
+            keywords.append(match.group(1).lower())
+        sentence_start = token.endswith((".", "?", "!"))
+    return keywords
+
+def find_verbatim_answer(question: str, context: str, before: int = 120, after: int = 180) -> str:
+    """Return the text around a question keyword that occurs exactly once in the context, or None."""
+    # Searched case-insensitively in place: no lowered copy of the document, and offsets stay valid for context
+    for keyword in question_keywords(question):
+        matches = re.finditer(r"\b%s\b" % re.escape(keyword), context, re.IGNORECASE)
+        first = next(matches, None)
+        if first is not None and next(matches, None) is None:
+            position = first.start()
+            return context[max(0, position - before):position + after]
+    return None
+
+def retrieval_index_key(document_id: int) -> str:
+    """Redis key holding the pickled retrieval index of a document."""
+    return f"doc:{document_id}:tfidf"
+
+def build_retrieval_index(chunks: list) -> tuple:
+    """Fit a TF-IDF index over the chunks, returning (vectorizer, matrix, chunks)."""
+    vectorizer = TfidfVectorizer()
+    try:
+        matrix = vectorizer.fit_transform(chunks)
+    except ValueError:
+        # Empty vocabulary, e.g. a scanned PDF without extractable text
+        return None, None, chunks
+    return vectorizer, matrix, chunks
+
+def find_relevant_chunk(question: str, vectorizer, matrix, chunks: list) -> str:
+    """Return the chunk most similar to the question."""
+    if not chunks:
+        return ""
+    if vectorizer is None:
+        return chunks[0]
+    # Rows are L2-normalised, so the sparse dot product is the cosine similarity
+    question_vector = vectorizer.transform([question])
+    scores = (matrix @ question_vector.T).toarray().ravel()
+    return chunks[int(scores.argmax())]